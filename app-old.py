@@ -61,7 +61,7 @@ DJANGO_APP_URL = config['DEFAULT']['DJANGO_APP_URL']
 # -------------------------------
 # FETCH DATA
 # -------------------------------
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
 def fetch_excel_data(record_id):
     try:
         url = f"{DJANGO_APP_URL}download_excel_api/{record_id}/"
@@ -70,12 +70,27 @@ def fetch_excel_data(record_id):
         if response.status_code != 200:
             return None, "API Error"
 
-        excel_data = BytesIO(response.content)
-        df = pd.read_excel(excel_data)
+        try:
+            df = pd.read_excel(BytesIO(response.content), engine="calamine")
+        except (ImportError, ValueError):
+            # python-calamine unavailable; fall back to the default openpyxl engine
+            df = pd.read_excel(BytesIO(response.content))
 
         if df.empty:
             return None, "Empty file"
 
+        # Narrow numeric dtypes and store repetitive text as category.
+        # Floats only narrow when float32 holds them exactly, as in normal-chart.py
+        for col in df.select_dtypes(include="float64").columns:
+            narrow = df[col].astype(np.float32)
+            if narrow.astype(np.float64).equals(df[col]):
+                df[col] = narrow
+        for col in df.select_dtypes(include="int64").columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+        for col in df.select_dtypes(include=["object", "string"]).columns:
+            if df[col].nunique() / len(df) < 0.5:
+                df[col] = df[col].astype("category")
+
         return df, None
 
     except requests.exceptions.Timeout:
@@ -83,6 +98,42 @@ def fetch_excel_data(record_id):
     except Exception as e:
         return None, str(e)
 
+# -------------------------------
+# BUILD PIVOT
+# -------------------------------
+# Cached on the filtered frame and the (hashable) pivot selections so
+# reruns that don't touch the pivot inputs reuse the previous result
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_pivot(df, row_cols, col_cols, value_config):
+    agg_dict = {}
+    for col, agg in value_config:
+        agg_dict.setdefault(col, []).append(agg)
+
+    # Exact float32 cells still round when summed in float32; reduce them in float64
+    wide = {col: np.float64 for col in agg_dict if df[col].dtype == np.float32}
+    if wide:
+        df = df.astype(wide)
+
+    pivot_df = pd.pivot_table(
+        df,
+        index=list(row_cols) if row_cols else None,
+        columns=list(col_cols) if col_cols else None,
+        values=list(agg_dict.keys()),
+        aggfunc=agg_dict,
+        fill_value=0,
+        observed=True
+    )
+
+    if isinstance(pivot_df.columns, pd.MultiIndex):
+        pivot_df.columns = pivot_df.columns.map(lambda t: "_".join(str(x) for x in t))
+
+    pivot_df = pivot_df.reset_index()
+
+    if not row_cols:
+        pivot_df = pivot_df.reset_index(drop=True)
+
+    return pivot_df
+
 # -------------------------------
 # GET QUERY PARAM
 # -------------------------------
@@ -106,7 +157,7 @@ if error:
 # COLUMN DETECTION
 # -------------------------------
 num_cols = df.select_dtypes(include=np.number).columns.tolist()
-cat_cols = df.select_dtypes(exclude=np.number).columns.tolist()
+cat_cols = df.columns.difference(num_cols, sort=False).tolist()
 
 #
 # # -------------------------------
@@ -267,7 +318,8 @@ st.markdown('<div class="sneat-header">🔍 Global Filters</div>', unsafe_allow_
 
 filter_cols = st.multiselect("Filter by", cat_cols)
 
-df_filtered = df.copy()
+# Combine every active filter into one mask and slice once
+mask = np.ones(len(df), dtype=bool)
 
 if filter_cols:
     filter_columns = st.columns(len(filter_cols))
@@ -276,7 +328,9 @@ if filter_cols:
             options = df[col].dropna().unique().tolist()
             selected = st.multiselect(f"{col}", options)
             if selected:
-                df_filtered = df_filtered[df_filtered[col].isin(selected)]
+                mask &= df[col].isin(selected).to_numpy()
+
+df_filtered = df.loc[mask]
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -291,27 +345,13 @@ if not value_config:
 # PIVOT
 # -------------------------------
 try:
-    agg_dict = {}
-    for col, agg in value_config:
-        agg_dict.setdefault(col, []).append(agg)
-
-    pivot_df = pd.pivot_table(
+    pivot_df = build_pivot(
         df_filtered,
-        index=row_cols if row_cols else None,
-        columns=col_cols if col_cols else None,
-        values=list(agg_dict.keys()),
-        aggfunc=agg_dict,
-        fill_value=0
+        tuple(row_cols),
+        tuple(col_cols),
+        tuple(value_config)
     )
 
-    if isinstance(pivot_df.columns, pd.MultiIndex):
-        pivot_df.columns = [f"{c[0]}_{c[1]}" for c in pivot_df.columns]
-
-    pivot_df = pivot_df.reset_index()
-
-    if not row_cols:
-        pivot_df = pivot_df.reset_index(drop=True)
-
 except Exception as e:
     st.error(f"Error building pivot: {e}")
     st.stop()
@@ -319,47 +359,54 @@ except Exception as e:
 # -------------------------------
 # SAVE CONFIG + LINK
 # -------------------------------
-if st.button("📊 Show Chart"):
-    link_placeholder = st.empty()
-    pivot_config = {
-        "rows": row_cols,
-        "columns": col_cols if col_cols else [],
-        "values": [
-            {"column": col, "aggregation": agg}
-            for col, agg in value_config
-        ],
-        "fill_value": 0,
-        "filters": {}
-    }
-
-    for col in filter_cols:
-        pivot_config["filters"][col] = df_filtered[col].unique().tolist()
-
-    url = f"{DJANGO_APP_URL}update_pivot_config/{record_id}/"
-    headers = {'Content-Type': 'application/json'}
-
-    try:
-        response = requests.put(url, headers=headers, data=json.dumps({"pivot_config": pivot_config}))
-
-        if response.status_code == 200:
-
-
-            redirect_url = f"{DJANGO_APP_URL}excel-upload/chart_view/{record_id}/"
+# Fragment: clicking the button reruns only this block, not the
+# fetch / filter / pivot pipeline above it
+@st.fragment
+def render_save_config(row_cols, col_cols, value_config, filter_cols, df_filtered):
+    if st.button("📊 Show Chart"):
+        link_placeholder = st.empty()
+        pivot_config = {
+            "rows": row_cols,
+            "columns": col_cols if col_cols else [],
+            "values": [
+                {"column": col, "aggregation": agg}
+                for col, agg in value_config
+            ],
+            "fill_value": 0,
+            "filters": {}
+        }
+
+        for col in filter_cols:
+            pivot_config["filters"][col] = df_filtered[col].unique().tolist()
+
+        url = f"{DJANGO_APP_URL}update_pivot_config/{record_id}/"
+        headers = {'Content-Type': 'application/json'}
+
+        try:
+            response = requests.put(url, headers=headers, data=json.dumps({"pivot_config": pivot_config}))
+
+            if response.status_code == 200:
+
+
+                redirect_url = f"{DJANGO_APP_URL}excel-upload/chart_view/{record_id}/"
+
+                # Show clickable link to open in new tab
+                link_placeholder.markdown(f"""
+                    <a href="{redirect_url}" target="_blank" style="display: inline-block; padding: 12px 24px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 4px; font-weight: bold; margin-top: 10px; cursor: pointer;">
+                        📊 Open Chart in New Tab
+                    </a>
+                """, unsafe_allow_html=True)
+
+                # redirect_url = f"{DJANGO_APP_URL}excel-upload/chart_view/{record_id}/"
+                # st.markdown(f'<a href="{redirect_url}" target="_blank">📊 Open Chart</a>', unsafe_allow_html=True)
+            else:
+                st.error("Failed to save config")
 
-            # Show clickable link to open in new tab
-            link_placeholder.markdown(f"""
-                <a href="{redirect_url}" target="_blank" style="display: inline-block; padding: 12px 24px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 4px; font-weight: bold; margin-top: 10px; cursor: pointer;">
-                    📊 Open Chart in New Tab
-                </a>
-            """, unsafe_allow_html=True)
+        except Exception as e:
+            st.error(str(e))
 
-            # redirect_url = f"{DJANGO_APP_URL}excel-upload/chart_view/{record_id}/"
-            # st.markdown(f'<a href="{redirect_url}" target="_blank">📊 Open Chart</a>', unsafe_allow_html=True)
-        else:
-            st.error("Failed to save config")
 
-    except Exception as e:
-        st.error(str(e))
+render_save_config(row_cols, col_cols, value_config, filter_cols, df_filtered)
 
 # -------------------------------
 # DISPLAY TABLE (UNCHANGED)
@@ -387,94 +434,46 @@ if st.button("📊 Show Chart"):
 #
 # table_html = pivot_display.to_html(index=False, classes="premium-table", border=0)
 
-pivot_display = pivot_df.copy()
-pivot_display.insert(0, "S.No", range(1, len(pivot_display) + 1))
+# build_pivot is st.cache_data, which hands back a fresh copy on every call, so
+# adding S.No in place is safe; under st.cache_resource this would corrupt the cached pivot
+pivot_display = pivot_df
+pivot_display.insert(0, "S.No", np.arange(1, len(pivot_display) + 1, dtype=np.int32))
 
 numeric_cols = pivot_display.select_dtypes(include=np.number).columns.tolist()
 if "S.No" in numeric_cols:
     numeric_cols.remove("S.No")
 
-grand_total = pivot_display[numeric_cols].sum().to_dict()
-grand_total["S.No"] = ""
+# Label every non-numeric cell, blank S.No, then scatter the column sums into place
+grand_total = np.full(len(pivot_display.columns), "Grand Total", dtype=object)
+grand_total[0] = ""
+grand_total[pivot_display.columns.get_indexer(numeric_cols)] = pivot_display[numeric_cols].to_numpy().sum(axis=0)
 
-for col in pivot_display.columns:
-    if col not in grand_total:
-        grand_total[col] = "Grand Total"
-
-pivot_display = pd.concat(
-    [pivot_display, pd.DataFrame([grand_total])],
-    ignore_index=True
-)
+# Kept as its own one-row frame so the body columns stay purely numeric
+total_row = pd.DataFrame([grand_total], columns=pivot_display.columns)
 
 # ❌ Removed column total calculation
 
-table_html = pivot_display.to_html(index=False, classes="premium-table", border=0)
-
-st.markdown("""
-<style>
-.table-card {
-    background: #fff;
-    padding: 20px;
-    border-radius: 10px;
-    box-shadow: 0 4px 12px rgba(67, 89, 113, 0.1);
-    border: 1px solid #d9dee3;
-}
-
-.table-responsive {
-    width: 100%;
-    max-height: 450px;
-    overflow-y: auto;
-    overflow-x: auto;
-}
-
-.table-responsive::-webkit-scrollbar {
-    height: 8px;
-    width: 8px;
-}
-.table-responsive::-webkit-scrollbar-thumb {
-    background: #d4d8dd;
-    border-radius: 10px;
-}
-
-.premium-table {
-    width: 100%;
-    border-collapse: collapse;
-    font-size: 14px;
-    min-width: 900px;
-}
+# -------------------------------
+# TABLE
+# -------------------------------
+PAGE_SIZE = 50
 
-.premium-table thead th {
-    position: sticky;
-    top: 0;
-    background: #f5f6ff;
-    color: #696cff;
-    font-size: 12px;
-    text-transform: uppercase;
-    z-index: 2;
-    padding: 12px;
-}
 
-.premium-table td {
-    padding: 10px 12px;
-    border-bottom: 1px solid #eceef1;
-    color: #566a7f;
-}
+# Fragment: changing page reruns only the table. Just one page of rows is
+# serialized to the browser, with the grand total pinned underneath it
+@st.fragment
+def render_table(body, total_row):
+    page_count = max(1, -(-len(body) // PAGE_SIZE))
+    page = 1
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
 
-.premium-table tbody tr:hover {
-    background: #f9f9ff;
-}
+    start = (page - 1) * PAGE_SIZE
+    st.dataframe(body.iloc[start:start + PAGE_SIZE], use_container_width=True, hide_index=True)
+    if not total_row.empty:
+        st.dataframe(total_row, use_container_width=True, hide_index=True)
+    if page_count > 1:
+        st.caption(f"Rows {start + 1}-{min(start + PAGE_SIZE, len(body))} of {len(body)}")
 
-.premium-table tbody tr:last-child {
-    font-weight: 600;
-    background: #f8f9ff;
-}
-</style>
-""", unsafe_allow_html=True)
 
-st.markdown(f"""
-<div class="table-card">
-    <div class="table-responsive">
-        {table_html}
-    </div>
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+render_table(pivot_display, total_row)
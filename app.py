@@ -4,8 +4,10 @@ import plotly.express as px
 import numpy as np
 import warnings
 import requests
+from requests.adapters import HTTPAdapter
 from io import BytesIO
 import configparser
+from http.cookiejar import DefaultCookiePolicy
 import os
 import json
 import time
@@ -58,24 +60,53 @@ config = configparser.ConfigParser()
 config.read(os.path.join(os.getcwd(), 'custom_config.ini'))
 DJANGO_APP_URL = config['DEFAULT']['DJANGO_APP_URL']
 
+# -------------------------------
+# HTTP SESSION
+# -------------------------------
+# One pooled keep-alive session per server process, so reruns skip the TCP/TLS handshake.
+# It is shared by every user, so it must stay stateless: cookies are never stored
+@st.cache_resource
+def get_session():
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 # -------------------------------
 # FETCH DATA
 # -------------------------------
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
 def fetch_excel_data(record_id):
     try:
         url = f"{DJANGO_APP_URL}download_excel_api/{record_id}/"
-        response = requests.get(url, timeout=10)
+        response = get_session().get(url, timeout=10)
 
         if response.status_code != 200:
             return None, "API Error"
 
-        excel_data = BytesIO(response.content)
-        df = pd.read_excel(excel_data)
+        try:
+            df = pd.read_excel(BytesIO(response.content), engine="calamine")
+        except (ImportError, ValueError):
+            # python-calamine unavailable; fall back to the default openpyxl engine
+            df = pd.read_excel(BytesIO(response.content))
 
         if df.empty:
             return None, "Empty file"
 
+        # Narrow numeric dtypes and store repetitive text as category.
+        # Floats only narrow when float32 holds them exactly, as in normal-chart.py
+        for col in df.select_dtypes(include="float64").columns:
+            narrow = df[col].astype(np.float32)
+            if narrow.astype(np.float64).equals(df[col]):
+                df[col] = narrow
+        for col in df.select_dtypes(include="int64").columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+        for col in df.select_dtypes(include=["object", "string"]).columns:
+            if df[col].nunique() / len(df) < 0.5:
+                df[col] = df[col].astype("category")
+
         return df, None
 
     except requests.exceptions.Timeout:
@@ -83,6 +114,51 @@ def fetch_excel_data(record_id):
     except Exception as e:
         return None, str(e)
 
+# -------------------------------
+# BUILD PIVOT
+# -------------------------------
+# Cached on the filtered frame and the (hashable) pivot selections so
+# reruns that don't touch the pivot inputs reuse the previous result
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_pivot(df, row_cols, col_cols, value_config):
+    agg_dict = {}
+    for col, agg in value_config:
+        agg_dict.setdefault(col, []).append(agg)
+
+    # Exact float32 cells still round when summed in float32; reduce them in float64
+    wide = {col: np.float64 for col in agg_dict if df[col].dtype == np.float32}
+    if wide:
+        df = df.astype(wide)
+
+    pivot_df = pd.pivot_table(
+        df,
+        index=list(row_cols) if row_cols else None,
+        columns=list(col_cols) if col_cols else None,
+        values=list(agg_dict.keys()),
+        aggfunc=agg_dict,
+        fill_value=0,
+        observed=True
+    )
+
+    # --- BEAUTIFY COLUMN NAMES ---
+    # Instead of "Sales | sum", we make it "Sum of Sales"
+    if isinstance(pivot_df.columns, pd.MultiIndex):
+        new_cols = []
+        for col_tuple in pivot_df.columns.values:
+            # col_tuple looks like: ('Sales', 'sum', 'Category_A')
+            # We clean it to be: "Sum of Sales (Category_A)"
+            metric_name = col_tuple[0]
+            agg_type = col_tuple[1].title()
+            extra_dims = " | ".join([str(x) for x in col_tuple[2:] if x])
+
+            name = f"{agg_type} of {metric_name}"
+            if extra_dims:
+                name += f" ({extra_dims})"
+            new_cols.append(name)
+        pivot_df.columns = new_cols
+
+    return pivot_df.reset_index()
+
 # -------------------------------
 # GET QUERY PARAM
 # -------------------------------
@@ -106,7 +182,7 @@ if error:
 # COLUMN DETECTION
 # -------------------------------
 num_cols = df.select_dtypes(include=np.number).columns.tolist()
-cat_cols = df.select_dtypes(exclude=np.number).columns.tolist()
+cat_cols = df.columns.difference(num_cols, sort=False).tolist()
 
 #
 # # -------------------------------
@@ -267,7 +343,8 @@ st.markdown('<div class="sneat-header">🔍 Global Filters</div>', unsafe_allow_
 
 filter_cols = st.multiselect("Filter by", cat_cols)
 
-df_filtered = df.copy()
+# Combine every active filter into one mask and slice once
+mask = np.ones(len(df), dtype=bool)
 
 if filter_cols:
     filter_columns = st.columns(len(filter_cols))
@@ -276,7 +353,9 @@ if filter_cols:
             options = df[col].dropna().unique().tolist()
             selected = st.multiselect(f"{col}", options)
             if selected:
-                df_filtered = df_filtered[df_filtered[col].isin(selected)]
+                mask &= df[col].isin(selected).to_numpy()
+
+df_filtered = df.loc[mask]
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -296,239 +375,135 @@ try:
     if not row_cols and not col_cols and not value_config:
         pivot_df = df_filtered.copy()
     else:
-        agg_dict = {}
-        for col, agg in value_config:
-            agg_dict.setdefault(col, []).append(agg)
-
-        pivot_df = pd.pivot_table(
+        pivot_df = build_pivot(
             df_filtered,
-            index=row_cols if row_cols else None,
-            columns=col_cols if col_cols else None,
-            values=list(agg_dict.keys()),
-            aggfunc=agg_dict,
-            fill_value=0
+            tuple(row_cols),
+            tuple(col_cols),
+            tuple(value_config)
         )
 
-        # --- BEAUTIFY COLUMN NAMES ---
-        # Instead of "Sales | sum", we make it "Sum of Sales"
-        if isinstance(pivot_df.columns, pd.MultiIndex):
-            new_cols = []
-            for col_tuple in pivot_df.columns.values:
-                # col_tuple looks like: ('Sales', 'sum', 'Category_A')
-                # We clean it to be: "Sum of Sales (Category_A)"
-                metric_name = col_tuple[0]
-                agg_type = col_tuple[1].title()
-                extra_dims = " | ".join([str(x) for x in col_tuple[2:] if x])
-
-                name = f"{agg_type} of {metric_name}"
-                if extra_dims:
-                    name += f" ({extra_dims})"
-                new_cols.append(name)
-            pivot_df.columns = new_cols
-
-        pivot_df = pivot_df.reset_index()
-
 except Exception as e:
     st.warning(f"⚠️ Pivot failed: {e}")
-    pivot_df = df_filtered.copy()
+    pivot_df = df_filtered.reset_index(drop=True)
 
 
 
 # -------------------------------
 # ✅ SAVE CONFIG + LINK
 # -------------------------------
-if st.button("📊 Show Chart"):
-    link_placeholder = st.empty()
-
-    pivot_config = {
-        "rows": row_cols,
-        "columns": col_cols if col_cols else [],
-        "values": [
-            {"column": col, "aggregation": agg}
-            for col, agg in value_config
-        ],
-        "fill_value": 0,
-        "filters": {}
-    }
-
-    for col in filter_cols:
-        pivot_config["filters"][col] = df_filtered[col].dropna().unique().tolist()
+# Fragment: clicking the button reruns only this block, not the
+# fetch / filter / pivot pipeline above it
+@st.fragment
+def render_save_config(row_cols, col_cols, value_config, filter_cols, df_filtered):
+    if st.button("📊 Show Chart"):
+        link_placeholder = st.empty()
+
+        pivot_config = {
+            "rows": row_cols,
+            "columns": col_cols if col_cols else [],
+            "values": [
+                {"column": col, "aggregation": agg}
+                for col, agg in value_config
+            ],
+            "fill_value": 0,
+            "filters": {}
+        }
+
+        for col in filter_cols:
+            pivot_config["filters"][col] = df_filtered[col].dropna().unique().tolist()
+
+        url = f"{DJANGO_APP_URL}update_pivot_config/{record_id}/"
+        headers = {'Content-Type': 'application/json'}
+
+        try:
+            response = get_session().put(
+                url,
+                headers=headers,
+                data=json.dumps({"pivot_config": pivot_config}),
+                timeout=10
+            )
 
-    url = f"{DJANGO_APP_URL}update_pivot_config/{record_id}/"
-    headers = {'Content-Type': 'application/json'}
+            if response.status_code == 200:
+                redirect_url = f"{DJANGO_APP_URL}excel-upload/chart_view/{record_id}/"
+
+                link_placeholder.markdown(f"""
+                    <a href="{redirect_url}" target="_blank"
+                       style="display: inline-block;
+                              padding: 12px 24px;
+                              background-color: #4CAF50;
+                              color: white;
+                              text-decoration: none;
+                              border-radius: 4px;
+                              font-weight: bold;
+                              margin-top: 10px;">
+                        📊 Open Chart in New Tab
+                    </a>
+                """, unsafe_allow_html=True)
+            else:
+                st.error("❌ Failed to save config")
 
-    try:
-        response = requests.put(
-            url,
-            headers=headers,
-            data=json.dumps({"pivot_config": pivot_config})
-        )
+        except Exception as e:
+            st.error(f"❌ {str(e)}")
 
-        if response.status_code == 200:
-            redirect_url = f"{DJANGO_APP_URL}excel-upload/chart_view/{record_id}/"
-
-            link_placeholder.markdown(f"""
-                <a href="{redirect_url}" target="_blank"
-                   style="display: inline-block;
-                          padding: 12px 24px;
-                          background-color: #4CAF50;
-                          color: white;
-                          text-decoration: none;
-                          border-radius: 4px;
-                          font-weight: bold;
-                          margin-top: 10px;">
-                    📊 Open Chart in New Tab
-                </a>
-            """, unsafe_allow_html=True)
-        else:
-            st.error("❌ Failed to save config")
 
-    except Exception as e:
-        st.error(f"❌ {str(e)}")
+render_save_config(row_cols, col_cols, value_config, filter_cols, df_filtered)
 
 
 # -------------------------------
 # USER-FRIENDLY DISPLAY PREP
 # -------------------------------
-pivot_display = pivot_df.copy()
+# build_pivot is st.cache_data, which hands back a fresh copy on every call, so
+# decorating it in place is safe; under st.cache_resource this would corrupt the cached pivot
+pivot_display = pivot_df
 
 # 1. Add Serial Number
-pivot_display.insert(0, "S.No", range(1, len(pivot_display) + 1))
+pivot_display.insert(0, "S.No", np.arange(1, len(pivot_display) + 1, dtype=np.int32))
 
 # 2. Identify Numeric columns for formatting
 numeric_cols = pivot_display.select_dtypes(include=np.number).columns.tolist()
 if "S.No" in numeric_cols: numeric_cols.remove("S.No")
 
 # 3. Create Grand Total
+# Kept as its own one-row frame so the body columns never mix numbers and labels
+total_row = pd.DataFrame(columns=pivot_display.columns)
 if not pivot_display.empty:
-    totals = pivot_display[numeric_cols].sum()
-    total_row = {col: "" for col in pivot_display.columns}
-    total_row[pivot_display.columns[1]] = "Grand Total"  # Put label in the first data column
-    for col in numeric_cols:
-        total_row[col] = totals[col]
-
-    pivot_display = pd.concat([pivot_display, pd.DataFrame([total_row])], ignore_index=True)
+    # One reduction over the contiguous numeric block instead of a per-column pandas sum
+    totals = pivot_display[numeric_cols].to_numpy(dtype=np.float64).sum(axis=0)
+    grand_total = {col: "" for col in pivot_display.columns}
+    grand_total[pivot_display.columns[1]] = "Grand Total"  # Put label in the first data column
+    grand_total.update(zip(numeric_cols, totals))
+    total_row = pd.DataFrame([grand_total])
 
 # 4. Final Formatting (Currency/Decimals)
 for col in numeric_cols:
     # Format to 2 decimal places and add commas for readability
     # pivot_display[col] = pivot_display[col].apply(lambda x: f"{x:,.2f}" if isinstance(x, (int, float)) else x)
-    pivot_display[col] = pivot_display[col].apply(
-        lambda x: f"{x:,.2f}".replace(".00", "") if isinstance(x, (int, float)) else x
-    )
+    for frame in (pivot_display, total_row):
+        frame[col] = frame[col].apply(
+            lambda x: f"{x:,.2f}".replace(".00", "") if isinstance(x, (int, float)) else x
+        )
 
 # -------------------------------
-# ENHANCED CSS & HTML
+# TABLE
 # -------------------------------
-st.markdown("""
-<style>
-    .table-card {
-        background: white;
-        padding: 15px;
-        border-radius: 12px;
-        box-shadow: 0 4px 20px rgba(0,0,0,0.05);
-        border: 1px solid #eee;
-    }
-    .premium-table {
-        width: 100%;
-        border-collapse: collapse;
-        font-family: 'Inter', sans-serif;
-    }
-    .premium-table thead th {
-        background-color: #f8f9ff;
-        color: #566a7f;
-        font-weight: 600;
-        padding: 12px;
-        text-align: left;
-        border-bottom: 2px solid #696cff;
-        white-space: nowrap;
-    }
-    .premium-table tbody td {
-        padding: 10px 12px;
-        border-bottom: 1px solid #f0f2f4;
-        color: #677788;
-    }
-    /* Highlight the Total Row */
-    .premium-table tbody tr:last-child {
-        background-color: #f4f5ff !important;
-        font-weight: bold;
-        color: #696cff;
-    }
-    .premium-table tbody tr:hover {
-        background-color: #fcfcff;
-    }
-</style>
-""", unsafe_allow_html=True)
+PAGE_SIZE = 50
 
-table_html = pivot_display.to_html(index=False, classes="premium-table", border=0)
 
+# Fragment: changing page reruns only the table. Just one page of rows is
+# serialized to the browser, with the grand total pinned underneath it
+@st.fragment
+def render_table(body, total_row):
+    page_count = max(1, -(-len(body) // PAGE_SIZE))
+    page = 1
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
 
+    start = (page - 1) * PAGE_SIZE
+    st.dataframe(body.iloc[start:start + PAGE_SIZE], use_container_width=True, hide_index=True)
+    if not total_row.empty:
+        st.dataframe(total_row, use_container_width=True, hide_index=True)
+    if page_count > 1:
+        st.caption(f"Rows {start + 1}-{min(start + PAGE_SIZE, len(body))} of {len(body)}")
 
-st.markdown("""
-<style>
-.table-card {
-    background: #fff;
-    padding: 20px;
-    border-radius: 10px;
-    box-shadow: 0 4px 12px rgba(67, 89, 113, 0.1);
-    border: 1px solid #d9dee3;
-}
-
-.table-responsive {
-    width: 100%;
-    max-height: 450px;
-    overflow-y: auto;
-    overflow-x: auto;
-}
-
-.table-responsive::-webkit-scrollbar {
-    height: 8px;
-    width: 8px;
-}
-.table-responsive::-webkit-scrollbar-thumb {
-    background: #d4d8dd;
-    border-radius: 10px;
-}
-
-.premium-table {
-    width: 100%;
-    border-collapse: collapse;
-    font-size: 14px;
-    min-width: 900px;
-}
-
-.premium-table thead th {
-    position: sticky;
-    top: 0;
-    background: #f5f6ff;
-    color: #696cff;
-    font-size: 12px;
-    text-transform: uppercase;
-    z-index: 2;
-    padding: 12px;
-}
-
-.premium-table td {
-    padding: 10px 12px;
-    border-bottom: 1px solid #eceef1;
-    color: #566a7f;
-}
-
-.premium-table tbody tr:hover {
-    background: #f9f9ff;
-}
-
-.premium-table tbody tr:last-child {
-    font-weight: 600;
-    background: #f8f9ff;
-}
-</style>
-""", unsafe_allow_html=True)
 
-st.markdown(f"""
-<div class="table-card">
-    <div class="table-responsive">
-        {table_html}
-    </div>
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+render_table(pivot_display, total_row)
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import numpy as np
 import warnings
+from io import BytesIO
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 # --- SETUP & THEMING ---
 warnings.filterwarnings("ignore")
@@ -50,15 +54,237 @@ st.markdown("""
 
 
 # --- HELPER FUNCTIONS ---
-@st.cache_data
-def load_data(file):
-    if file.name.endswith(".csv"):
-        df = pd.read_csv(file)
+def read_csv_text_dates(file_bytes):
+    # pyarrow's CSV reader turns ISO date/time text into date and timestamp values,
+    # where the C engine kept the text; re-read just those columns as strings so
+    # filter labels and exports show the file's own spelling
+    convert = pacsv.ConvertOptions(strings_can_be_null=True)
+    table = pacsv.read_csv(BytesIO(file_bytes), convert_options=convert)
+    dated = [
+        field.name for field in table.schema
+        if pa.types.is_date(field.type) or pa.types.is_time(field.type) or pa.types.is_timestamp(field.type)
+    ]
+    if dated:
+        convert.include_columns = dated
+        convert.column_types = {col: pa.string() for col in dated}
+        text = pacsv.read_csv(BytesIO(file_bytes), convert_options=convert)
+        for col in dated:
+            table = table.set_column(table.schema.get_field_index(col), col, text[col])
+    return table.to_pandas()
+
+
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def load_data(file_bytes, name):
+    # Keyed on the raw bytes so reruns reuse the parsed frame for the same upload
+    if name.endswith(".csv"):
+        df = read_csv_text_dates(file_bytes)
     else:
-        df = pd.read_excel(file)
+        try:
+            df = pd.read_excel(BytesIO(file_bytes), engine="calamine")
+        except (ImportError, ValueError):
+            # python-calamine unavailable; fall back to the default openpyxl engine
+            df = pd.read_excel(BytesIO(file_bytes))
+
+    # Narrow numeric dtypes; int sums still accumulate in int64, so totals can't overflow.
+    # Floats only narrow when float32 holds them exactly, or the Data tab shows rounding noise
+    for col in df.select_dtypes(include="float64").columns:
+        narrow = df[col].astype(np.float32)
+        if narrow.astype(np.float64).equals(df[col]):
+            df[col] = narrow
+    for col in df.select_dtypes(include="int64").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+
+    # Categorical codes make filter isin checks and pivot grouping integer work
+    for col in df.select_dtypes(exclude=np.number).columns:
+        df[col] = df[col].astype("category")
+
+    # Dedupe after narrowing so row hashing runs over the smaller columns
     return df.drop_duplicates()
 
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_pivot(df, row_cols, col_cols, val_cols, agg_func):
+    # Selections arrive as tuples so they hash; work with lists below
+    row_cols, col_cols, val_cols = list(row_cols), list(col_cols), list(val_cols)
+
+    # Exact float32 cells still round when summed in float32; reduce them in float64
+    wide = {col: np.float64 for col in val_cols if df[col].dtype == np.float32}
+    if wide:
+        df = df.astype(wide)
+
+    # One hash-grouped reduction instead of pivot_table's multi-pass machinery;
+    # observed=True keeps categorical keys from expanding into every combination
+    grouped = df.groupby(row_cols + col_cols, observed=True)[val_cols].agg(agg_func)
+    grouped = grouped.fillna(0)
+    if col_cols:
+        pivot_df = grouped.unstack(col_cols, fill_value=0)
+    else:
+        pivot_df = grouped
+    # Match pivot_table's sorted metric order
+    pivot_df = pivot_df.sort_index(axis=1)
+    # Flatten multi-level columns if user chose "Columns"
+    if isinstance(pivot_df.columns, pd.MultiIndex):
+        pivot_df.columns = pivot_df.columns.map(lambda t: "_".join(str(x) for x in t))
+
+    return pivot_df.reset_index()
+
+
+# Line/Area series longer than this are thinned to LTTB_POINTS before plotting
+LTTB_THRESHOLD = 4000
+LTTB_POINTS = 2000
+
+# Pie/Donut show the largest categories individually and sum the remainder
+PIE_TOP_N = 12
+
+
+def lttb_indices(y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the point in each bucket that forms the
+    # largest triangle with the previous kept point and the next bucket's average
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample_indices(y):
+    # Row positions to plot for one series: all of them unless it is long enough to thin
+    if len(y) > LTTB_THRESHOLD:
+        return lttb_indices(y, LTTB_POINTS)
+    return np.arange(len(y))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_figure(pivot_df, chart_type, main_x, plot_cols):
+    # Cached on the pivot and chart type, so flipping back to a chart skips trace
+    # construction; returned as a plain dict because that pickles cheaply
+    plot_cols = list(plot_cols)
+
+    # Single-series views only need one total per category, so skip the long-form melt
+    if chart_type in ["Bar", "Pie", "Donut"]:
+        category_totals = (
+            pivot_df[plot_cols].sum(axis=1)
+            .groupby(pivot_df[main_x], observed=True).sum()
+            .rename("Val")
+            .reset_index()
+        )
+
+    fig = None
+
+    if chart_type == "Bar":
+        # SIMPLE BAR: Sum all metrics to show one total bar per category
+        fig = px.bar(
+            category_totals,
+            x=main_x,
+            y="Val",
+            template="plotly_white",
+            color_discrete_sequence=['#696cff']  # Premium solid color
+        )
+        fig.update_layout(showlegend=False)
+
+    elif chart_type in ["Stacked Bar", "Grouped Bar"]:
+        # STACKED: Metrics placed on top of each other; GROUPED: side-by-side
+        # One trace per wide pivot column, built directly instead of through px + melt
+        x_vals = pivot_df[main_x].to_numpy()
+        fig = go.Figure([go.Bar(x=x_vals, y=pivot_df[m].to_numpy(), name=m) for m in plot_cols])
+        fig.update_layout(barmode="relative" if chart_type == "Stacked Bar" else "group")
+
+    elif chart_type == "Line":
+        # WebGL traces thinned on one shared index, so every trace has the same x
+        # values: main_x is categorical, and traces with different x would append
+        # categories out of order and zigzag backwards
+        block = pivot_df[plot_cols].to_numpy()
+        if len(plot_cols) > 1 and len(block) > LTTB_THRESHOLD:
+            # Follow the per-row envelope; half the budget each on max and min
+            # keeps the combined index within LTTB_POINTS however many series
+            keep = np.union1d(
+                lttb_indices(block.max(axis=1), LTTB_POINTS // 2),
+                lttb_indices(block.min(axis=1), LTTB_POINTS // 2),
+            )
+        else:
+            keep = downsample_indices(block[:, 0])
+        x_vals = pivot_df[main_x].to_numpy()[keep]
+        fig = go.Figure([
+            go.Scattergl(x=x_vals, y=pivot_df[m].to_numpy()[keep], mode="lines+markers", name=m)
+            for m in plot_cols
+        ])
+
+    elif chart_type == "Area":
+        # Stacked series must share x positions, so thin on the row totals
+        keep = downsample_indices(pivot_df[plot_cols].to_numpy().sum(axis=1))
+        x_vals = pivot_df[main_x].to_numpy()[keep]
+        fig = go.Figure([
+            go.Scatter(x=x_vals, y=pivot_df[m].to_numpy()[keep], mode="lines", stackgroup="one", name=m)
+            for m in plot_cols
+        ])
+
+    elif chart_type in ["Pie", "Donut"]:
+        # Group metrics for total pie view; beyond PIE_TOP_N slices the rest fold into "Other"
+        pie_vals = category_totals.set_index(main_x)["Val"]
+        top = pie_vals.nlargest(PIE_TOP_N)
+        labels = top.index.astype(object).tolist()
+        values = top.to_numpy().tolist()
+        if len(pie_vals) > PIE_TOP_N:
+            labels.append("Other")
+            values.append(pie_vals.sum() - top.sum())
+        is_donut = 0.4 if chart_type == "Donut" else 0
+        fig = go.Figure(go.Pie(labels=labels, values=values, hole=is_donut))
+
+    if chart_type in ["Stacked Bar", "Grouped Bar", "Line", "Area"]:
+        # Same axis and legend titles plotly express gave the long-form charts
+        fig.update_layout(xaxis_title=main_x, yaxis_title="Val", legend_title_text="Metric")
+
+    if fig is None:
+        return None
+    fig.update_layout(margin=dict(t=20, b=20, l=20, r=20))
+    return fig.to_dict()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def to_csv_bytes(pivot_df):
+    # Cached so repeated downloads of the same pivot don't re-serialize it.
+    # Row labels are categoricals; render date/bool categories the way to_csv
+    # does (2024-01-01, True) so only the small category index is formatted
+    labels = {}
+    for col in pivot_df.select_dtypes(include="category").columns:
+        cats = pivot_df[col].cat.categories
+        if pd.api.types.is_datetime64_any_dtype(cats) or pd.api.types.is_bool_dtype(cats):
+            labels[col] = pivot_df[col].cat.rename_categories(cats.astype(str))
+
+    try:
+        buf = BytesIO()
+        # Header comes from pandas; Arrow quotes every string value unless quoting is
+        # off, so write unquoted and let values that need quotes raise ArrowInvalid
+        buf.write(pivot_df.iloc[:0].to_csv(index=False).encode('utf-8'))
+        pacsv.write_csv(
+            pa.Table.from_pandas(pivot_df.assign(**labels), preserve_index=False),
+            buf,
+            pacsv.WriteOptions(include_header=False, quoting_style="none")
+        )
+        return buf.getvalue()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        # Labels containing a comma, quote or newline, or column types Arrow can't
+        # convert; pandas' writer quotes those correctly
+        return pivot_df.to_csv(index=False).encode('utf-8')
+
+
 # --- SIDEBAR: CONFIGURATION ---
 with st.sidebar:
     st.title("💎 Config")
@@ -68,9 +294,9 @@ with st.sidebar:
         st.info("Please upload a file to begin.")
         st.stop()
 
-    df = load_data(uploaded_file)
+    df = load_data(uploaded_file.getvalue(), uploaded_file.name)
     num_cols = df.select_dtypes(include=np.number).columns.tolist()
-    cat_cols = df.select_dtypes(exclude=np.number).columns.tolist()
+    cat_cols = df.columns.difference(num_cols, sort=False).tolist()
 
     st.subheader("🧮 Pivot Logic")
     row_cols = st.multiselect("Rows (Categories)", cat_cols, help="Fields for the X-axis")
@@ -80,12 +306,15 @@ with st.sidebar:
 
     st.subheader("🔍 Global Filters")
     filter_cols = st.multiselect("Filter by", cat_cols)
-    df_filtered = df.copy()
+    # Combine every active filter into one mask and slice once
+    mask = np.ones(len(df), dtype=bool)
     for col in filter_cols:
-        options = df[col].dropna().unique().tolist()
+        # Categories are already deduplicated and NaN-free
+        options = df[col].cat.categories.tolist()
         selected = st.multiselect(f"Select {col}", options)
         if selected:
-            df_filtered = df_filtered[df_filtered[col].isin(selected)]
+            mask &= df[col].isin(selected).to_numpy()
+    df_filtered = df.loc[mask]
 
 # --- MAIN CONTENT ---
 st.title("Business Intelligence Insights")
@@ -104,9 +333,11 @@ kpi_cols = st.columns(len(val_cols) + 1)
 # Total Records KPI
 kpi_cols[0].metric("Total Rows", f"{len(df_filtered):,}")
 
-# Dynamic KPIs for selected metrics
-for i, v_col in enumerate(val_cols):
-    res = getattr(df_filtered[v_col], agg_func)()
+# Dynamic KPIs for selected metrics, reduced in one pass over the metric block
+kpi_values = df_filtered[val_cols].astype(
+    {col: np.float64 for col in val_cols if df_filtered[col].dtype == np.float32}
+).agg(agg_func)
+for i, (v_col, res) in enumerate(kpi_values.items()):
     label = f"{agg_func.upper()} {v_col}"
     if res >= 1_000_000:
         val_str = f"{res / 1_000_000:.1f}M"
@@ -118,19 +349,7 @@ for i, v_col in enumerate(val_cols):
 
 # 2. DATA PROCESSING
 try:
-    pivot_df = pd.pivot_table(
-        df_filtered,
-        index=row_cols,
-        columns=col_cols if col_cols else None,
-        values=val_cols,
-        aggfunc=agg_func,
-        fill_value=0
-    )
-    # Flatten multi-level columns if user chose "Columns"
-    if isinstance(pivot_df.columns, pd.MultiIndex):
-        pivot_df.columns = ['_'.join(map(str, c)) for c in pivot_df.columns]
-
-    pivot_df = pivot_df.reset_index()
+    pivot_df = build_pivot(df_filtered, tuple(row_cols), tuple(col_cols), tuple(val_cols), agg_func)
 except Exception as e:
     st.error(f"Error building pivot: {e}")
     st.stop()
@@ -138,7 +357,11 @@ except Exception as e:
 # 3. TABS FOR VISUALIZATION
 tab_viz, tab_data = st.tabs(["📑 Data Explorer", "📊 Analytics View"])
 
-with tab_viz:
+
+# Fragments: switching chart type or downloading reruns only that tab, not the
+# sidebar, filters and pivot above
+@st.fragment
+def render_viz(pivot_df, row_cols):
     # Modern Choice Selection
     chart_type = st.segmented_control(
         "Select Visualization Type",
@@ -151,9 +374,6 @@ with tab_viz:
     main_x = row_cols[0]
     plot_cols = [c for c in pivot_df.columns if c not in row_cols]
 
-    # Melt data for Plotly Long Format
-    melted = pivot_df.melt(id_vars=row_cols, value_vars=plot_cols, var_name="Metric", value_name="Val")
-
     # st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     #
     # fig = None
@@ -167,50 +387,25 @@ with tab_viz:
     #     fig = px.bar(melted, x=main_x, y="Val", color="Metric", barmode="group")
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
 
-    fig = None
-
-    if chart_type == "Bar":
-        # SIMPLE BAR: Sum all metrics to show one total bar per category
-        simple_bar_data = melted.groupby(main_x)["Val"].sum().reset_index()
-        fig = px.bar(
-            simple_bar_data,
-            x=main_x,
-            y="Val",
-            template="plotly_white",
-            color_discrete_sequence=['#696cff']  # Premium solid color
-        )
-        fig.update_layout(showlegend=False)
-
-    elif chart_type == "Stacked Bar":
-        # STACKED: Metrics placed on top of each other (Default px.bar behavior)
-        fig = px.bar(melted, x=main_x, y="Val", color="Metric", barmode="relative")
-
-    elif chart_type == "Grouped Bar":
-        # GROUPED: Metrics placed side-by-side
-        fig = px.bar(melted, x=main_x, y="Val", color="Metric", barmode="group")
-
-    elif chart_type == "Line":
-        fig = px.line(melted, x=main_x, y="Val", color="Metric", markers=True)
-
-    elif chart_type == "Area":
-        fig = px.area(melted, x=main_x, y="Val", color="Metric")
-
-    elif chart_type in ["Pie", "Donut"]:
-        # Group metrics for total pie view
-        pie_data = melted.groupby(main_x)["Val"].sum().reset_index()
-        is_donut = 0.4 if chart_type == "Donut" else 0
-        fig = px.pie(pie_data, names=main_x, values="Val", hole=is_donut)
-
+    fig = build_figure(pivot_df, chart_type, main_x, tuple(plot_cols))
     if fig:
-        fig.update_layout(margin=dict(t=20, b=20, l=20, r=20))
         st.plotly_chart(fig, use_container_width=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-with tab_data:
+
+@st.fragment
+def render_data(pivot_df):
     st.subheader("Pivot Table Result")
     st.dataframe(pivot_df, use_container_width=True)
 
     # Download Button
-    csv_data = pivot_df.to_csv(index=False).encode('utf-8')
+    csv_data = to_csv_bytes(pivot_df)
     st.download_button("📥 Download This Table", data=csv_data, file_name="analytics_export.csv", mime="text/csv")
+
+
+with tab_viz:
+    render_viz(pivot_df, row_cols)
+
+with tab_data:
+    render_data(pivot_df)